@@ -1,39 +1,192 @@
+import asyncio
+import math
 import os
+import shutil
+import tempfile
 import uuid
+import aiofiles
 import numpy as np
-from gtts import gTTS
-from transformers import pipeline
-from presidio_analyzer import AnalyzerEngine
+import ctranslate2
+from google.cloud import texttospeech
+from google.cloud.texttospeech_v1.services.text_to_speech.transports import TextToSpeechGrpcAsyncIOTransport
+from transformers import AutoTokenizer
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine
+from presidio_analyzer.nlp_engine import NlpEngineProvider
 from presidio_anonymizer import AnonymizerEngine
 
 # Note: The models themselves will be loaded once in main.py for efficiency.
 
-def process_audio_file(
-    audio_path: str,
-    output_dir: str,
-    whisper_model,
-    summarizer,
-    analyzer,
-    anonymizer
-) -> dict:
+# Number of VAD chunks transcribed together in one Whisper forward pass.
+WHISPER_BATCH_SIZE = 16
+
+# Options for every transcribe() call, shared with the startup warm-up in main.py.
+WHISPER_TRANSCRIBE_OPTIONS = {
+    "batch_size": WHISPER_BATCH_SIZE,
+    "beam_size": 1,
+    "vad_filter": True
+}
+
+# Sample rate Whisper expects for raw PCM input.
+SAMPLE_RATE = 16000
+
+# PII entity types that Presidio should look for.
+PII_ENTITIES = ["PERSON", "PHONE_NUMBER", "EMAIL_ADDRESS", "CREDIT_CARD_NUMBER", "LOCATION"]
+
+# Presidio defaults to en_core_web_lg (~750 MB); the small model is plenty for short call transcripts.
+PRESIDIO_SPACY_MODEL = "en_core_web_sm"
+
+# Transcripts per spaCy nlp.pipe batch inside Presidio's analyzer.
+PRESIDIO_BATCH_SIZE = 64
+
+# Presidio only reads tokens, lemmas and entities from spaCy, so the dependency parser is dead weight.
+UNUSED_SPACY_PIPES = ["parser"]
+
+# Summaries are generated by a distilled BART model converted to CTranslate2.
+SUMMARIZER_MODEL = "sshleifer/distilbart-cnn-12-6"
+CT2_MODELS_DIR = "models"
+
+# Summarization is best for longer texts.
+MIN_SUMMARY_WORDS = 50
+
+
+class CTranslate2Summarizer:
     """
-    Runs the full audio processing pipeline using local open-source models.
+    BART summarizer running on CTranslate2 with int8 weights instead of PyTorch.
+    Takes a list of texts and returns one summary string per text.
+    """
+
+    def __init__(self, model_dir: str, tokenizer_name: str, intra_threads: int = 0):
+        if ctranslate2.get_cuda_device_count() > 0:
+            device, compute_type = "cuda", "int8_float16"
+        else:
+            device, compute_type = "cpu", "int8"
+        self.translator = ctranslate2.Translator(
+            model_dir,
+            device=device,
+            compute_type=compute_type,
+            intra_threads=intra_threads
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+
+    def __call__(self, texts: list, max_length: int = 150, min_length: int = 30) -> list:
+        source = [
+            self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(text, truncation=True))
+            for text in texts
+        ]
+        # Greedy decoding: one hypothesis is enough for short summaries.
+        outputs = self.translator.translate_batch(
+            source,
+            max_batch_size=len(source),
+            beam_size=1,
+            max_decoding_length=max_length,
+            min_decoding_length=min_length,
+            no_repeat_ngram_size=3
+        )
+        return [
+            self.tokenizer.decode(
+                self.tokenizer.convert_tokens_to_ids(output.hypotheses[0]),
+                skip_special_tokens=True
+            )
+            for output in outputs
+        ]
+
+
+def _convert_summarizer(model_name: str, model_dir: str):
+    """
+    Converts a Hugging Face model to an int8 CTranslate2 model in model_dir.
+    Converts into a temporary directory and moves it into place, so concurrent
+    workers and interrupted runs never leave a half-written model behind.
+    """
+    parent_dir = os.path.dirname(model_dir) or "."
+    os.makedirs(parent_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent_dir, prefix=".converting-")
+    try:
+        ctranslate2.converters.TransformersConverter(model_name).convert(
+            tmp_dir, quantization="int8", force=True
+        )
+        if os.path.isdir(model_dir) and not os.path.isfile(os.path.join(model_dir, "model.bin")):
+            # A model directory without model.bin (e.g. an incomplete manual copy) can't be loaded.
+            shutil.rmtree(model_dir, ignore_errors=True)
+        try:
+            os.replace(tmp_dir, model_dir)
+        except OSError:
+            # Another worker moved its finished conversion into place first.
+            if not os.path.isfile(os.path.join(model_dir, "model.bin")):
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_summarizer(model_name: str = SUMMARIZER_MODEL, intra_threads: int = 0) -> CTranslate2Summarizer:
+    """
+    Loads the CTranslate2 summarizer from models/<model name>. The model can be
+    converted offline with `ct2-transformers-converter --quantization int8`;
+    otherwise it is converted on first use.
+    """
+    model_dir = os.path.join(CT2_MODELS_DIR, model_name.replace("/", "--"))
+    if not os.path.isfile(os.path.join(model_dir, "model.bin")):
+        print(f"Converting {model_name} to CTranslate2 (one-time)...")
+        _convert_summarizer(model_name, model_dir)
+    return CTranslate2Summarizer(model_dir, model_name, intra_threads=intra_threads)
+
+
+def disable_unused_spacy_pipes(analyzer):
+    """
+    Turns off spaCy components that Presidio's spaCy NLP engine never reads.
+    """
+    for nlp in getattr(analyzer.nlp_engine, "nlp", {}).values():
+        for name in UNUSED_SPACY_PIPES:
+            if name in nlp.pipe_names:
+                nlp.disable_pipe(name)
+
+
+def create_analyzer() -> AnalyzerEngine:
+    """
+    Builds the Presidio analyzer on top of the small spaCy English model.
+    """
+    provider = NlpEngineProvider(nlp_configuration={
+        "nlp_engine_name": "spacy",
+        "models": [{"lang_code": "en", "model_name": PRESIDIO_SPACY_MODEL}]
+    })
+    analyzer = AnalyzerEngine(nlp_engine=provider.create_engine(), supported_languages=["en"])
+    disable_unused_spacy_pipes(analyzer)
+    return analyzer
+
+
+def create_tts_client():
+    """
+    Creates the async gRPC Google Cloud Text-to-Speech client.
+    The gRPC channel binds to the running event loop, so call this from inside it.
+    """
+    transport = TextToSpeechGrpcAsyncIOTransport(
+        channel=TextToSpeechGrpcAsyncIOTransport.create_channel()
+    )
+    return texttospeech.TextToSpeechAsyncClient(transport=transport)
+
+
+def _transcribe(audio_path: str, whisper_model) -> dict:
+    """
+    Transcribes one audio file and scores the confidence of the transcript.
     """
     results = {}
-    print("Step 1: Transcribing audio with Whisper...")
-    
-    # 1. Transcription with Whisper
-    transcription_result = whisper_model.transcribe(audio_path, fp16=False) # Set fp16=False if not using a GPU
-    results['transcript'] = transcription_result['text']
+
+    # 1. Transcription with Whisper (faster-whisper BatchedInferencePipeline)
+    # transcribe() returns a lazy generator, so materialize it before using the segments.
+    segments, info = whisper_model.transcribe(audio_path, **WHISPER_TRANSCRIBE_OPTIONS)
+    segments = list(segments)
+    results['transcript'] = "".join(segment.text for segment in segments).strip()
 
     # 2. Confidence Scoring (simplified for Whisper)
     # Whisper provides average log probability for segments. We can use this as a confidence proxy.
     # Lower logprob is better (less negative). We'll convert it to a 0-1 scale.
-    if transcription_result['segments']:
-        logprobs = [segment['avg_logprob'] for segment in transcription_result['segments']]
-        avg_logprob = np.mean(logprobs)
-        # np.exp brings it to a 0-1 probability scale. Closer to 1 is more confident.
-        confidence = np.exp(avg_logprob) 
+    if segments:
+        logprobs = np.fromiter(
+            (segment.avg_logprob for segment in segments),
+            dtype=np.float64,
+            count=len(segments)
+        )
+        # exp brings it to a 0-1 probability scale. Closer to 1 is more confident.
+        confidence = math.exp(logprobs.mean())
     else:
         confidence = 0.0
 
@@ -44,50 +197,155 @@ def process_audio_file(
         results['confidence_level'] = "MEDIUM"
     else:
         results['confidence_level'] = "LOW"
-    
-    print(f"Step 2: Transcription complete. Confidence: {results['confidence_level']}")
-
-    # 3. PII Redaction with Presidio
-    print("Step 3: Redacting PII with Presidio...")
-    analyzer_results = analyzer.analyze(
-        text=results['transcript'],
-        entities=["PERSON", "PHONE_NUMBER", "EMAIL_ADDRESS", "CREDIT_CARD_NUMBER", "LOCATION"],
-        language='en'
-    )
-    anonymized_result = anonymizer.anonymize(
-        text=results['transcript'],
-        analyzer_results=analyzer_results
-    )
-    results['redacted_transcript'] = anonymized_result.text
-    print("Step 3: PII Redaction complete.")
-
-    # 4. Summarization with Transformers (BART)
-    print("Step 4: Summarizing text...")
-    # Summarization is best for longer texts.
-    if len(results['transcript'].split()) > 50:
-        summary = summarizer(
-            results['transcript'],
+
+    return results
+
+
+def _summarize(transcripts: list, summarizer) -> list:
+    """
+    Summarizes every long enough transcript in a single batched summarizer call.
+    """
+    summaries = ["Text is too short to summarize."] * len(transcripts)
+    long_indices = [
+        i for i, transcript in enumerate(transcripts)
+        if len(transcript.split()) > MIN_SUMMARY_WORDS
+    ]
+    if long_indices:
+        outputs = summarizer(
+            [transcripts[i] for i in long_indices],
             max_length=150,
-            min_length=30,
-            do_sample=False
+            min_length=30
         )
-        results['summary'] = summary[0]['summary_text']
-    else:
-        results['summary'] = "Text is too short to summarize."
-    print("Step 4: Summarization complete.")
-    
-    # 5. Text-to-Speech with gTTS
-    print("Step 5: Generating audio summary with gTTS...")
-    tts = gTTS(results['summary'], lang='en')
-    
+        for i, summary in zip(long_indices, outputs):
+            summaries[i] = summary
+    return summaries
+
+
+def _redact_pii(transcripts: list, analyzer, anonymizer) -> list:
+    """
+    Finds and anonymizes PII in every transcript with one batched Presidio pass.
+    Returns a (redacted_text, analyzer_results) pair per transcript.
+    """
+    batch_analyzer = BatchAnalyzerEngine(analyzer_engine=analyzer)
+    batch_analyzer_results = batch_analyzer.analyze_iterator(
+        texts=transcripts,
+        language='en',
+        entities=PII_ENTITIES,
+        # All transcripts go through spaCy's nlp.pipe together instead of one nlp() call each.
+        batch_size=PRESIDIO_BATCH_SIZE
+    )
+    redactions = []
+    for transcript, analyzer_results in zip(transcripts, batch_analyzer_results):
+        anonymized_result = anonymizer.anonymize(
+            text=transcript,
+            analyzer_results=analyzer_results
+        )
+        redactions.append((anonymized_result.text, analyzer_results))
+    return redactions
+
+
+async def _text_to_speech(summary: str, output_dir: str, tts_client) -> str:
+    """
+    Saves the spoken summary as an MP3 in output_dir and returns its filename.
+    """
+    response = await tts_client.synthesize_speech(
+        input=texttospeech.SynthesisInput(text=summary),
+        voice=texttospeech.VoiceSelectionParams(language_code="en-US"),
+        audio_config=texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
+    )
+
     output_filename = f"summary_{uuid.uuid4()}.mp3"
     output_path = os.path.join(output_dir, output_filename)
-    tts.save(output_path)
-    
-    results['summary_audio_filename'] = output_filename
-    print("Step 5: Audio summary generated.")
-
-    return {
-        **results,  # Unpack existing results dict
-        "pii_results": analyzer_results # Add the list of found PII entities
-    }
\ No newline at end of file
+    async with aiofiles.open(output_path, 'wb') as f:
+        await f.write(response.audio_content)
+    return output_filename
+
+
+async def process_audio_batch(
+    audio_paths: list,
+    output_dir: str,
+    whisper_model,
+    summarizer,
+    analyzer,
+    anonymizer,
+    tts_client
+) -> list:
+    """
+    Runs the full audio processing pipeline over several files at once.
+    The Presidio and summarization stages process all transcripts together,
+    so concurrent requests share one pass through each model. The blocking
+    model calls run in worker threads, and the independent stages overlap.
+    tts_client must come from create_tts_client() on the same event loop.
+
+    Returns one entry per path: the results dict, or the exception raised while
+    transcribing or synthesizing speech for that file. Failures in the batched
+    Presidio and summarization stages are raised, since they affect every file.
+    """
+    print(f"Step 1: Transcribing {len(audio_paths)} audio file(s) with Whisper...")
+    # A file that fails to decode or transcribe only fails its own slot;
+    # the other files carry on through the shared stages.
+    transcriptions = await asyncio.gather(*(
+        asyncio.to_thread(_transcribe, audio_path, whisper_model)
+        for audio_path in audio_paths
+    ), return_exceptions=True)
+    ok_indices = [i for i, results in enumerate(transcriptions) if not isinstance(results, Exception)]
+    batch_results = [transcriptions[i] for i in ok_indices]
+    transcripts = [results['transcript'] for results in batch_results]
+    levels = ", ".join(results['confidence_level'] for results in batch_results)
+    print(f"Step 2: Transcription complete. Confidence: {levels}")
+
+    if batch_results:
+        # 3. PII Redaction with Presidio and 4. Summarization with Transformers (BART)
+        # Both only depend on the transcript, so they run concurrently.
+        print("Step 3/4: Redacting PII with Presidio and summarizing text...")
+        redactions, summaries = await asyncio.gather(
+            asyncio.to_thread(_redact_pii, transcripts, analyzer, anonymizer),
+            asyncio.to_thread(_summarize, transcripts, summarizer)
+        )
+        for results, (redacted_text, analyzer_results), summary in zip(batch_results, redactions, summaries):
+            results['redacted_transcript'] = redacted_text
+            results['pii_results'] = analyzer_results # Add the list of found PII entities
+            results['summary'] = summary
+        print("Step 3/4: PII Redaction and summarization complete.")
+
+        # 5. Text-to-Speech with Google Cloud TTS (async gRPC)
+        print("Step 5: Generating audio summary with Google Cloud TTS...")
+        # Synthesis is one call per file, so a failed call only fails its own slot.
+        audio_filenames = await asyncio.gather(*(
+            _text_to_speech(results['summary'], output_dir, tts_client)
+            for results in batch_results
+        ), return_exceptions=True)
+        for i, results, audio_filename in zip(ok_indices, batch_results, audio_filenames):
+            if isinstance(audio_filename, Exception):
+                transcriptions[i] = audio_filename
+            else:
+                results['summary_audio_filename'] = audio_filename
+        print("Step 5: Audio summary generated.")
+
+    return transcriptions
+
+
+async def process_audio_file(
+    audio_path: str,
+    output_dir: str,
+    whisper_model,
+    summarizer,
+    analyzer,
+    anonymizer,
+    tts_client
+) -> dict:
+    """
+    Runs the full audio processing pipeline using local open-source models.
+    """
+    batch_results = await process_audio_batch(
+        [audio_path],
+        output_dir=output_dir,
+        whisper_model=whisper_model,
+        summarizer=summarizer,
+        analyzer=analyzer,
+        anonymizer=anonymizer,
+        tts_client=tts_client
+    )
+    if isinstance(batch_results[0], Exception):
+        raise batch_results[0]
+    return batch_results[0]
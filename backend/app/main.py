@@ -1,15 +1,40 @@
 import os
-import shutil
 import uuid
-import whisper
+import aiofiles
+import blake3
+import numpy as np
+from functools import partial
+from faster_whisper import WhisperModel, BatchedInferencePipeline
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from transformers import pipeline
-from presidio_analyzer import AnalyzerEngine
 from presidio_anonymizer import AnonymizerEngine
 
-from .audio_pipeline import process_audio_file
+from .audio_pipeline import (
+    SAMPLE_RATE,
+    WHISPER_TRANSCRIBE_OPTIONS,
+    create_analyzer,
+    create_tts_client,
+    load_summarizer,
+    process_audio_batch
+)
+from .request_queue import RequestQueue
+from .results_cache import ResultsCache
+
+# --- Worker Threads ---
+# Run several processes with `WEB_CONCURRENCY=4 uvicorn app.main:app`: uvicorn uses
+# WEB_CONCURRENCY as its default --workers, and each worker reads it here. Each worker
+# loads its own models, so split the CPU cores between them instead of letting every
+# worker's thread pools claim all of them.
+try:
+    WORKERS = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+except ValueError:
+    print(f"Ignoring invalid WEB_CONCURRENCY={os.environ['WEB_CONCURRENCY']!r}; assuming 1 worker.")
+    WORKERS = 1
+if "WEB_CONCURRENCY" not in os.environ:
+    print("WEB_CONCURRENCY is not set; sizing thread pools for a single worker. "
+          "Set it instead of passing --workers to uvicorn when running several workers.")
+CPU_THREADS = max(1, (os.cpu_count() or 1) // WORKERS)
 
 # --- Model Loading ---
 # This is done once when the server starts.
@@ -17,28 +42,74 @@ print("Loading AI models, this may take a moment...")
 
 # 1. Whisper for Transcription (using 'base.en' for a good balance)
 # Models: tiny.en, base.en, small.en, medium.en, large
+# faster-whisper runs Whisper through CTranslate2; int8 weights are much faster on CPU.
 print("Loading Whisper model...")
-WHISPER_MODEL = whisper.load_model("base.en")
+WHISPER_MODEL = WhisperModel("base.en", device="cpu", compute_type="int8", cpu_threads=CPU_THREADS)
+# The batched pipeline splits audio into VAD chunks and runs them through the encoder together.
+BATCHED_WHISPER = BatchedInferencePipeline(model=WHISPER_MODEL)
 
 # 2. Presidio for PII Redaction
 print("Loading Presidio analyzer and anonymizer...")
-ANALYZER = AnalyzerEngine()
+ANALYZER = create_analyzer()
 ANONYMIZER = AnonymizerEngine()
 
-# 3. Transformers for Summarization (using a popular BART model)
+# 3. Summarization (a distilled BART model, about twice as fast as bart-large-cnn,
+# running on CTranslate2 with int8 weights)
 print("Loading Summarization model...")
-SUMMARIZER = pipeline("summarization", model="facebook/bart-large-cnn")
+SUMMARIZER = load_summarizer(intra_threads=CPU_THREADS)
+
+# 4. Warm-up: run each model once so the first request doesn't pay for
+# kernel selection, allocator growth and lazy initialization.
+print("Warming up models...")
+WARMUP_AUDIO = np.zeros(SAMPLE_RATE, dtype=np.float32)
+# VAD off, so the silent clip actually runs through the Whisper encoder and decoder.
+segments, _ = WHISPER_MODEL.transcribe(WARMUP_AUDIO, beam_size=1)
+list(segments)
+# The request path with VAD on finds no speech in silence, so this only loads the Silero VAD session.
+segments, _ = BATCHED_WHISPER.transcribe(WARMUP_AUDIO, **WHISPER_TRANSCRIBE_OPTIONS)
+list(segments)
+SUMMARIZER(["warmup " * 60], max_length=20, min_length=5)
+ANALYZER.analyze(text="john", language='en', entities=["PERSON"])
 
 print("All models loaded successfully!")
 # --- End Model Loading ---
 
 
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Results of recent uploads, keyed by the BLAKE3 hash of the audio bytes.
+RESULTS_CACHE = ResultsCache()
+
 # Create necessary directories
 os.makedirs("uploads", exist_ok=True)
 os.makedirs("outputs", exist_ok=True)
 
+# Concurrent uploads are grouped and run through the models as one batch.
+# Created on startup because the TTS client's gRPC channel needs the running event loop.
+REQUEST_QUEUE = None
+
 app = FastAPI()
 
+@app.on_event("startup")
+async def start_request_queue():
+    global REQUEST_QUEUE
+    REQUEST_QUEUE = RequestQueue(
+        partial(
+            process_audio_batch,
+            output_dir="outputs",
+            whisper_model=BATCHED_WHISPER,
+            summarizer=SUMMARIZER,
+            analyzer=ANALYZER,
+            anonymizer=ANONYMIZER,
+            tts_client=create_tts_client()
+        )
+    )
+    REQUEST_QUEUE.start()
+
+@app.on_event("shutdown")
+async def stop_request_queue():
+    await REQUEST_QUEUE.stop()
+
 # Configure CORS
 origins = ["http://localhost:3000"]
 app.add_middleware(
@@ -63,20 +134,22 @@ async def create_upload_file(file: UploadFile = File(...)):
     upload_path = os.path.join("uploads", unique_filename)
     
     try:
-        with open(upload_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Process the audio file using the pre-loaded models
-        results = process_audio_file(
-            audio_path=upload_path,
-            output_dir="outputs",
-            whisper_model=WHISPER_MODEL,
-            summarizer=SUMMARIZER,
-            analyzer=ANALYZER,
-            anonymizer=ANONYMIZER
-        )
-        
-        results["summary_audio_url"] = f"/outputs/{results['summary_audio_filename']}"
+        # Stream the upload to disk in 1 MB chunks without blocking the event loop,
+        # hashing it on the way so repeated uploads can be answered from the cache
+        hasher = blake3.blake3()
+        async with aiofiles.open(upload_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                hasher.update(chunk)
+                await buffer.write(chunk)
+        audio_hash = hasher.hexdigest()
+
+        results = RESULTS_CACHE.get(audio_hash)
+        if results is None:
+            # Process the audio file using the pre-loaded models, batched with other pending uploads
+            results = await REQUEST_QUEUE.submit(upload_path)
+
+            results["summary_audio_url"] = f"/outputs/{results['summary_audio_filename']}"
+            RESULTS_CACHE.put(audio_hash, results)
 
     except Exception as e:
         # Clean up in case of error
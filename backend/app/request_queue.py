@@ -0,0 +1,77 @@
+import asyncio
+
+# Requests arriving within this window (in seconds) are grouped into one batch.
+DEFAULT_MAX_WAIT = 0.05
+DEFAULT_MAX_BATCH_SIZE = 8
+
+
+class RequestQueue:
+    """
+    Collects audio uploads from concurrent requests and runs them through the
+    pipeline together, so the shared models process one batch instead of
+    serializing the requests one by one.
+    """
+
+    def __init__(self, process_batch, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT):
+        # process_batch is a coroutine function that takes a list of audio paths
+        # and returns one entry per path: a results dict, or the exception that
+        # failed that path alone.
+        self._process_batch = process_batch
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        """Starts the background batch worker. Must be called from the running event loop."""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._batch_worker())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, audio_path: str) -> dict:
+        """Queues an audio file and waits for its pipeline results."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((audio_path, future))
+        return await future
+
+    async def _batch_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._max_wait
+            while len(batch) < self._max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch):
+        audio_paths = [audio_path for audio_path, _ in batch]
+        try:
+            batch_results = await self._process_batch(audio_paths)
+        except Exception as e:
+            # A shared stage failed, so no request in the batch can succeed.
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), results in zip(batch, batch_results):
+            if future.done():
+                continue
+            if isinstance(results, Exception):
+                future.set_exception(results)
+            else:
+                future.set_result(results)
@@ -0,0 +1,28 @@
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 128
+
+
+class ResultsCache:
+    """
+    Small LRU cache of pipeline results keyed by the hash of the uploaded audio,
+    so re-uploading the same file skips every processing stage.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, audio_hash: str):
+        """Returns a copy of the cached results, or None on a miss."""
+        results = self._entries.get(audio_hash)
+        if results is None:
+            return None
+        self._entries.move_to_end(audio_hash)
+        return dict(results)
+
+    def put(self, audio_hash: str, results: dict):
+        self._entries[audio_hash] = dict(results)
+        self._entries.move_to_end(audio_hash)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
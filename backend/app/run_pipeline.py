@@ -1,15 +1,14 @@
+import asyncio
 import sys
 import os
-import whisper
+from faster_whisper import WhisperModel, BatchedInferencePipeline
 import datetime
-from transformers import pipeline
-from presidio_analyzer import AnalyzerEngine
 from presidio_anonymizer import AnonymizerEngine
 
 # Ensure the app module can be found
 # This allows us to import from app.audio_pipeline
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
-from audio_pipeline import process_audio_file
+from audio_pipeline import create_analyzer, create_tts_client, load_summarizer, process_audio_file
 
 # --- File Definitions ---
 OUTPUT_DIR = "pipeline_outputs"
@@ -17,6 +16,12 @@ TRANSCRIPT_FILENAME = "output_transcript.txt"
 SUMMARY_FILENAME = "output_summary.mp3"
 LOG_FILENAME = "audit.log"
 
+async def run_pipeline(**kwargs) -> dict:
+    """
+    Runs the pipeline on the current event loop, which the TTS client must be created on.
+    """
+    return await process_audio_file(tts_client=create_tts_client(), **kwargs)
+
 def main():
     """
     Main function to run the entire pipeline from the command line.
@@ -34,23 +39,25 @@ def main():
     # --- Load Models ---
     # This is done here so we only load them when running this script.
     print("Loading AI models, this may take a moment...")
-    whisper_model = whisper.load_model("base.en")
-    summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-    analyzer = AnalyzerEngine()
+    whisper_model = BatchedInferencePipeline(
+        model=WhisperModel("base.en", device="cpu", compute_type="int8")
+    )
+    summarizer = load_summarizer()
+    analyzer = create_analyzer()
     anonymizer = AnonymizerEngine()
     print("All models loaded successfully!")
 
     # --- Run Processing ---
     print(f"\nProcessing audio file: {audio_path}")
     try:
-        results = process_audio_file(
+        results = asyncio.run(run_pipeline(
             audio_path=audio_path,
             output_dir=OUTPUT_DIR, # We will handle file naming explicitly
             whisper_model=whisper_model,
             summarizer=summarizer,
             analyzer=analyzer,
             anonymizer=anonymizer
-        )
+        ))
     except Exception as e:
         print(f"An error occurred during pipeline processing: {e}")
         sys.exit(1)